@@ -6,6 +6,12 @@ __version__ = "0.2.0"
 __author__ = "Fasil"
 __email__ = "fasilwdr@hotmail.com"
 
-from .core import OdooUpgrader
+__all__ = ["OdooUpgrader"]
 
-__all__ = ["OdooUpgrader"]
\ No newline at end of file
+
+def __getattr__(name):
+    # Import the upgrader lazily so the CLI can start without loading core
+    if name == "OdooUpgrader":
+        from .core import OdooUpgrader
+        return OdooUpgrader
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,74 +1,163 @@
+import os
+import sys
+import atexit
+import queue
 import click
 import logging
-from rich.logging import RichHandler
-from .core import OdooUpgrader
-
-# Configure Base Logging with Rich Handler for Console
-logging.basicConfig(
-    level="INFO",
-    format="%(message)s",
-    datefmt="[%X]",
-    handlers=[RichHandler(rich_tracebacks=True, show_level=False, show_path=False)]
-)
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener
+from .versions import VALID_VERSIONS
 
+_FILE_FMT = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S',
+                              validate=False)
 
-@click.command()
-@click.option(
-    "--source",
-    required=True,
-    help="Path to local .zip/.dump file or URL"
-)
-@click.option(
-    "--version",
-    required=True,
-    type=click.Choice(OdooUpgrader.VALID_VERSIONS),
-    help="Target Odoo version"
-)
-@click.option(
-    "--extra-addons",
-    required=False,
-    help="Custom addons location: can be a local folder, a local .zip file, or a URL to a .zip file."
-)
-@click.option(
-    "--verbose",
-    is_flag=True,
-    help="Enable verbose logging"
-)
-@click.option(
-    "--postgres-version",
-    default="13",
-    help="PostgreSQL version for the database container (default: 13)"
-)
-@click.option(
-    "--log-file",
-    type=click.Path(),
-    help="Path to log file"
-)
-def main(source, version, extra_addons, verbose, postgres_version, log_file):
-    """
-    Odoo Database Upgrade Tool.
+# Single-process CLI: skip filling thread/process attributes on every record
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
+
+_configured = False
+_listener = None
+
+
+class _LocalQueueHandler(QueueHandler):
+    """QueueHandler for an in-process queue: records are passed on untouched, keeping exc_info."""
+
+    def prepare(self, record):
+        return record
+
+
+def _shutdown_logging():
+    """Stops the log listener and closes its handlers."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for h in _listener.handlers:
+            target = getattr(h, "target", None)
+            h.close()
+            if target is not None:
+                target.close()
+        _listener = None
+
+
+def _configure_logging(verbose, log_file):
+    """Configures the odooupgrader logger, replacing any previous setup."""
+    global _configured, _listener
+    logger = logging.getLogger("odooupgrader")
+
+    if _configured:
+        _shutdown_logging()
+        for h in list(logger.handlers):
+            logger.removeHandler(h)
+            h.close()
+    else:
+        atexit.register(_shutdown_logging)
+        _configured = True
+
+    # Plain stdout handler by default; Rich only for interactive terminals
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter("%(message)s"))
+    if os.environ.get("ODOOUPGRADER_PRETTY_LOGS", "1") == "1" and sys.stdout.isatty():
+        from rich.highlighter import NullHighlighter
+        from rich.logging import RichHandler
+        stream = RichHandler(
+            rich_tracebacks=verbose,
+            show_level=False,
+            show_path=False,
+            markup=False,
+            highlighter=NullHighlighter(),
+            log_time_format="[%X]"
+        )
+    stream.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG if verbose else logging.INFO)
+    # The console handler stays synchronous so log lines keep their order relative to console.print
+    logger.addHandler(stream)
 
-    Automates the upgrade of an Odoo database (zip or dump)
-    to a target version using OCA/OpenUpgrade.
-    """
     if log_file:
         file_handler = logging.FileHandler(log_file)
         file_handler.setLevel(logging.DEBUG if verbose else logging.INFO)
-        file_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
+        file_handler.setFormatter(_FILE_FMT)
+
+        # Batch file writes; errors still flush immediately so crash logs are kept
+        buffered = MemoryHandler(capacity=1024, flushLevel=logging.ERROR, target=file_handler, flushOnClose=True)
+        buffered.setLevel(logging.DEBUG if verbose else logging.INFO)
+
+        # Callers only enqueue records; formatting and file I/O happen on the listener thread
+        log_queue = queue.Queue(-1)
+        logger.addHandler(_LocalQueueHandler(log_queue))
+        _listener = QueueListener(log_queue, buffered, respect_handler_level=True)
+        _listener.start()
+
 
-        logger = logging.getLogger("odooupgrader")
-        logger.addHandler(file_handler)
-        logger.setLevel(logging.DEBUG if verbose else logging.INFO)
+def _main_impl(source, version, extra_addons, verbose, postgres_version, log_file, keep_db_volume):
+    """Runs the upgrade with the options parsed by Click."""
+    _configure_logging(verbose, log_file)
+
+    from .core import OdooUpgrader
 
     upgrader = OdooUpgrader(
         source=source,
         target_version=version,
         extra_addons=extra_addons,
         verbose=verbose,
-        postgres_version=postgres_version
+        postgres_version=postgres_version,
+        keep_db_volume=keep_db_volume
     )
     upgrader.run()
 
 
+# Options are instantiated once at import rather than through stacked decorators
+_OPTIONS = [
+    click.Option(
+        ["--source"],
+        required=True,
+        help="Path to local .zip/.dump file or URL"
+    ),
+    click.Option(
+        ["--version"],
+        required=True,
+        type=click.Choice(VALID_VERSIONS),
+        help="Target Odoo version"
+    ),
+    click.Option(
+        ["--extra-addons"],
+        required=False,
+        help="Custom addons location: can be a local folder, a local .zip file, or a URL to a .zip file."
+    ),
+    click.Option(
+        ["--verbose"],
+        is_flag=True,
+        help="Enable verbose logging"
+    ),
+    click.Option(
+        ["--postgres-version"],
+        default="13",
+        help="PostgreSQL version for the database container (default: 13)"
+    ),
+    click.Option(
+        ["--log-file"],
+        help="Path to log file"
+    ),
+    click.Option(
+        ["--keep-db-volume"],
+        is_flag=True,
+        help="Keep the Postgres volume after the run and skip the restore when the source is unchanged"
+    ),
+]
+
+main_cmd = click.Command(
+    "odooupgrader",
+    params=_OPTIONS,
+    callback=_main_impl,
+    help=(
+        "Odoo Database Upgrade Tool.\n\n"
+        "Automates the upgrade of an Odoo database (zip or dump)\n"
+        "to a target version using OCA/OpenUpgrade."
+    )
+)
+main = main_cmd
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,39 +1,106 @@
 import os
+import hashlib
+import json
 import shutil
 import subprocess
 import sys
 import time
+import threading
+import collections
+import functools
 import zipfile
 import logging
-from typing import Optional, List
+from contextlib import nullcontext
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, IO, Callable, Optional, List, Iterator, Tuple
 
-import requests
-from packaging import version
 from rich.console import Console
-from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn, TimeElapsedColumn
+
+from .versions import VALID_VERSIONS
+
+if TYPE_CHECKING:
+    import requests
+    from packaging import version
+    from rich.progress import Progress
 
 console = Console()
 logger = logging.getLogger("odooupgrader")
 
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+CHMOD_BATCH_SIZE = 64
+PROGRESS_UPDATE_BYTES = 16 * 1024 * 1024
+DOWNLOAD_PARTS = 8
+PARALLEL_DOWNLOAD_MIN_SIZE = 64 * 1024 * 1024
+DOWNLOAD_RETRIES = 3
+STDERR_TAIL_LINES = 500
+VERSION_CHECK_INTERVAL = 3
+DB_VOLUME_PREFIX = "odooupgrade-postgres-data"
+TEMPLATE_DB = "database_src"
+
+# Attachments in these formats gain nothing from DEFLATE
+PRECOMPRESSED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".pdf", ".zip", ".webp", ".gz", ".mp4", ".docx",
+                            ".xlsx", ".odt", ".ods"}
+# Odoo filestore entries have no extension, so fall back to sniffing the file header
+PRECOMPRESSED_SIGNATURES = (b"\xff\xd8\xff", b"\x89PNG", b"GIF8", b"%PDF", b"PK\x03\x04", b"\x1f\x8b")
+
+_session = None
+
+
+def get_session() -> "requests.Session":
+    """Returns the shared session so validation and downloads reuse pooled connections."""
+    global _session
+    if _session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _session = session
+    return _session
+
+
+class DownloadCancelled(Exception):
+    """Raised inside a download worker when a sibling task has failed."""
+
+
+@functools.lru_cache(maxsize=32)
+def _parse_version(ver_str: str) -> "version.Version":
+    """Cached packaging.version.parse; unparsable strings map to 0.0."""
+    from packaging import version
+
+    try:
+        return version.parse(ver_str.strip())
+    except Exception:
+        return version.parse("0.0")
+
 
 class OdooUpgrader:
-    VALID_VERSIONS = ["10.0", "11.0", "12.0", "13.0", "14.0", "15.0", "16.0", "17.0", "18.0"]
+    VALID_VERSIONS = VALID_VERSIONS
 
     def __init__(self, source: str, target_version: str, extra_addons: Optional[str] = None, verbose: bool = False,
-                 postgres_version: str = "13"):
+                 postgres_version: str = "13", keep_db_volume: bool = False):
         self.source = source
         self.target_version = target_version
         self.extra_addons = extra_addons
         self.verbose = verbose
         self.postgres_version = postgres_version
+        self.keep_db_volume = keep_db_volume
         self.cwd = os.getcwd()
+        self._posix = sys.platform != "win32"
         self.source_dir = os.path.join(self.cwd, 'source')
         self.output_dir = os.path.join(self.cwd, 'output')
         self.filestore_dir = os.path.join(self.output_dir, 'filestore')
         self.custom_addons_dir = os.path.join(self.output_dir, 'custom_addons')
-        self.compose_cmd = self._get_docker_compose_cmd()
-
-    def _run_cmd(self, cmd: List[str], check: bool = True, capture_output: bool = False) -> subprocess.CompletedProcess:
+        self._compose_cmd_cached: Optional[List[str]] = None
+        self._progress: Optional["Progress"] = None
+        self._cancel = threading.Event()
+        self._version_query_idx: Optional[int] = None
+        self._source_fingerprint = ""
+
+    def _run_cmd(self, cmd: List[str], check: bool = True, capture_output: bool = False,
+                 stdin: Optional[IO] = None) -> subprocess.CompletedProcess:
         """Executes a subprocess command and logs it."""
         cmd_str = " ".join(cmd)
         logger.debug(f"Executing: {cmd_str}")
@@ -43,7 +110,8 @@ class OdooUpgrader:
                 cmd,
                 check=check,
                 text=True,
-                capture_output=capture_output
+                capture_output=capture_output,
+                stdin=stdin
             )
             if capture_output and result.stdout:
                 logger.debug(f"Command Output: {result.stdout.strip()}")
@@ -54,28 +122,144 @@ class OdooUpgrader:
                 logger.error(f"Error output: {e.stderr.strip()}")
             raise
 
+    @property
+    def compose_cmd(self) -> List[str]:
+        """Docker Compose invocation, probed on first use."""
+        if self._compose_cmd_cached is None:
+            self._compose_cmd_cached = self._get_docker_compose_cmd()
+        return self._compose_cmd_cached
+
     def _get_docker_compose_cmd(self) -> List[str]:
         """Determines if 'docker compose' or 'docker-compose' is available."""
-        try:
-            subprocess.run(["docker", "compose", "version"], check=True, capture_output=True)
+        override = os.environ.get("ODOOUPGRADER_COMPOSE_CMD", "").split()
+        if override:
+            return override
+        # Locate binaries on PATH instead of running them; the v1 docker-compose binary is end-of-life
+        if shutil.which("docker"):
             return ["docker", "compose"]
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            try:
-                subprocess.run(["docker-compose", "--version"], check=True, capture_output=True)
-                return ["docker-compose"]
-            except (subprocess.CalledProcessError, FileNotFoundError):
-                return ["docker", "compose"]
+        if shutil.which("docker-compose"):
+            return ["docker-compose"]
+
+        msg = "Docker was not found on PATH. Install Docker or set ODOOUPGRADER_COMPOSE_CMD."
+        console.print(f"[bold red]Error:[/bold red] {msg}")
+        logger.error(msg)
+        sys.exit(1)
 
     def _cleanup_dir(self, path: str):
         """Safely removes a directory."""
-        if os.path.exists(path):
+        try:
+            shutil.rmtree(path)
+            logger.debug(f"Removed directory: {path}")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            msg = f"Warning: Could not remove {path}: {e}"
+            console.print(f"[yellow]{msg}[/yellow]")
+            logger.warning(msg)
+
+    def _iter_files(self, root: str) -> Iterator[Tuple[str, str]]:
+        """Yields (path, name) for every file below root using os.scandir."""
+        stack = [root]
+        while stack:
+            current = stack.pop()
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        yield entry.path, entry.name
+
+    def _iter_chmod_targets(self, root: str, file_mode: int, dir_mode: int,
+                            script_mode: Optional[int] = None) -> Iterator[Tuple[str, int]]:
+        """Yields (path, mode) pairs for everything below root using os.scandir."""
+        stack = [root]
+        while stack:
+            current = stack.pop()
             try:
-                shutil.rmtree(path)
-                logger.debug(f"Removed directory: {path}")
-            except Exception as e:
-                msg = f"Warning: Could not remove {path}: {e}"
-                console.print(f"[yellow]{msg}[/yellow]")
-                logger.warning(msg)
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                            yield entry.path, dir_mode
+                        elif script_mode is not None and entry.name.endswith('.sh'):
+                            yield entry.path, script_mode
+                        else:
+                            yield entry.path, file_mode
+            except OSError as e:
+                logger.debug(f"Could not scan {current}: {e}")
+
+    def _parallel_chmod(self, root: str, file_mode: int, dir_mode: int, script_mode: Optional[int] = None):
+        """Applies permissions to every file and directory below root using a thread pool."""
+
+        def _chmod_batch(batch: List[Tuple[str, int]]):
+            for path, mode in batch:
+                try:
+                    os.chmod(path, mode)
+                except OSError as e:
+                    logger.debug(f"Could not chmod {path}: {e}")
+
+        # Batches are submitted while the walk continues, so scanning overlaps with chmod calls
+        workers = min(32, (os.cpu_count() or 1) * 4)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            batch: List[Tuple[str, int]] = []
+            for target in self._iter_chmod_targets(root, file_mode, dir_mode, script_mode):
+                batch.append(target)
+                if len(batch) >= CHMOD_BATCH_SIZE:
+                    futures.append(executor.submit(_chmod_batch, batch))
+                    batch = []
+            if batch:
+                futures.append(executor.submit(_chmod_batch, batch))
+            for future in futures:
+                future.result()
+
+    def _extract_members(self, zip_path: str, names: List[str], dest: str):
+        """Extracts the given members using a ZipFile handle owned by the calling thread."""
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            for name in names:
+                try:
+                    zip_ref.extract(name, dest)
+                except FileExistsError:
+                    # Another worker created the parent directory concurrently
+                    zip_ref.extract(name, dest)
+
+    def _parallel_extract(self, zip_path: str, dest: str):
+        """Extracts a zip archive with bsdtar when available, otherwise across a thread pool."""
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            infos = zip_ref.infolist()
+
+        if shutil.which("bsdtar"):
+            os.makedirs(dest, exist_ok=True)
+            try:
+                self._run_cmd(["bsdtar", "-xf", zip_path, "-C", dest], capture_output=True)
+                return
+            except subprocess.CalledProcessError:
+                logger.warning("bsdtar extraction failed. Falling back to Python extraction.")
+
+        # Later entries win, as with extractall; missing parent directories are created on demand
+        names = list(dict.fromkeys(info.filename for info in reversed(infos) if not info.is_dir()))
+        self._extract_members(zip_path, [info.filename for info in infos if info.is_dir()], dest)
+
+        workers = min(len(names), os.cpu_count() or 1)
+        if workers <= 1:
+            self._extract_members(zip_path, names, dest)
+            return
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self._extract_members, zip_path, names[i::workers], dest)
+                       for i in range(workers)]
+            for future in futures:
+                future.result()
+
+    def _url_status(self, url: str) -> int:
+        """Returns the HTTP status for url, retrying a rejected HEAD as a one-byte ranged GET."""
+        with get_session().head(url, timeout=30, allow_redirects=True) as response:
+            status = response.status_code
+        if 400 <= status < 500 or status == 501:
+            # Presigned S3/GCS URLs are signed for GET only, and some servers do not implement HEAD
+            with get_session().get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=30) as response:
+                status = response.status_code
+        return status
 
     def validate_source_accessibility(self):
         """Checks if source file or URL is valid using Requests."""
@@ -83,9 +267,12 @@ class OdooUpgrader:
         logger.info(f"Validating source: {self.source}")
 
         if self.source.startswith("http://") or self.source.startswith("https://"):
+            import requests
+
             try:
-                with requests.get(self.source, stream=True, timeout=30) as response:
-                    response.raise_for_status()
+                status = self._url_status(self.source)
+                if status >= 400:
+                    raise requests.RequestException(f"HTTP status {status}")
                 console.print("[green]Source URL is accessible.[/green]")
             except requests.RequestException as e:
                 console.print(f"[bold red]Error:[/bold red] Source URL is not accessible: {e}")
@@ -106,10 +293,11 @@ class OdooUpgrader:
                         f"[bold red]Error:[/bold red] Invalid protocol for addons URL. Only http/https supported.")
                     sys.exit(1)
 
+                import requests
+
                 try:
-                    with requests.head(self.extra_addons, timeout=30, allow_redirects=True) as response:
-                        if response.status_code >= 400:
-                            raise requests.RequestException("Status code error")
+                    if self._url_status(self.extra_addons) >= 400:
+                        raise requests.RequestException("Status code error")
                 except requests.RequestException:
                     console.print(f"[bold red]Error:[/bold red] Extra addons URL is not accessible.")
                     logger.error("Extra addons URL invalid")
@@ -126,47 +314,288 @@ class OdooUpgrader:
         self._cleanup_dir(self.source_dir)
         self._cleanup_dir(self.output_dir)
 
-        os.makedirs(self.source_dir, exist_ok=True)
-        os.makedirs(self.filestore_dir, exist_ok=True)
-        os.makedirs(self.custom_addons_dir, exist_ok=True)
-
-        if sys.platform != "win32":
+        dirs = (self.source_dir, self.filestore_dir, self.custom_addons_dir)
+        try:
+            for path in dirs:
+                os.makedirs(path)
+        except FileExistsError:
+            # Cleanup left something behind
+            for path in dirs:
+                os.makedirs(path, exist_ok=True)
+
+        if self._posix:
             try:
                 os.chmod(self.output_dir, 0o777)
-                for root, dirs, files in os.walk(self.output_dir):
-                    for d in dirs:
-                        os.chmod(os.path.join(root, d), 0o777)
-                    for f in files:
-                        os.chmod(os.path.join(root, f), 0o777)
+                self._parallel_chmod(self.output_dir, 0o777, 0o777)
             except Exception as e:
                 logger.warning(f"Could not set broad permissions on output dir: {e}")
 
+    def _download_progress(self) -> "Progress":
+        """Builds the progress display used for downloads."""
+        from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn, TimeElapsedColumn
+
+        return Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            TaskProgressColumn(),
+            "•",
+            TimeElapsedColumn(),
+            console=console
+        )
+
+    def _stream_to_file(self, response: "requests.Response", dest_path: str, progress: "Progress", description: str,
+                        total_size: Optional[int]):
+        """Writes a streamed response body to dest_path, reporting progress in batches."""
+        task = progress.add_task(f"[cyan]{description}", total=total_size)
+        response.raw.decode_content = True
+        # urllib3 1.x readinto() resizes the buffer when a decoded chunk outgrows it,
+        # so encoded bodies go through plain read() calls instead
+        encoded = "Content-Encoding" in response.headers
+        buf = bytearray(DOWNLOAD_CHUNK_SIZE)
+        view = memoryview(buf)
+        pending = 0
+        with open(dest_path, "wb") as f:
+            while True:
+                if self._cancel.is_set():
+                    raise DownloadCancelled(dest_path)
+                if encoded:
+                    chunk = response.raw.read(DOWNLOAD_CHUNK_SIZE)
+                    n = len(chunk)
+                    if not n:
+                        break
+                    f.write(chunk)
+                else:
+                    n = response.raw.readinto(buf)
+                    if not n:
+                        break
+                    f.write(view[:n])
+                pending += n
+                if pending >= PROGRESS_UPDATE_BYTES:
+                    progress.update(task, advance=pending)
+                    pending = 0
+        if pending:
+            progress.update(task, advance=pending)
+
     def download_file(self, url: str, dest_path: str, description: str = "Downloading..."):
         """Generic download helper."""
+        import requests
+        from urllib3.exceptions import HTTPError as Urllib3HTTPError
+
         logger.info(f"Downloading {url} to {dest_path}")
         try:
-            with requests.get(url, stream=True, timeout=60) as response:
+            with get_session().get(url, stream=True, timeout=60) as response:
                 response.raise_for_status()
-                total_size = int(response.headers.get("Content-Length", 0))
-
-                with Progress(
-                        SpinnerColumn(),
-                        TextColumn("[progress.description]{task.description}"),
-                        BarColumn(),
-                        TaskProgressColumn(),
-                        "•",
-                        TimeElapsedColumn(),
-                        console=console
-                ) as progress:
-                    task = progress.add_task(f"[cyan]{description}", total=total_size)
-                    with open(dest_path, "wb") as f:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            f.write(chunk)
-                            progress.update(task, advance=len(chunk))
-        except requests.RequestException as e:
+                # Content-Length is the encoded size, so it is no total for a decoded body
+                total_size: Optional[int] = None
+                if "Content-Encoding" not in response.headers:
+                    total_size = int(response.headers.get("Content-Length", 0)) or None
+
+                # Reuse the shared progress display when downloads run concurrently
+                if self._progress is not None:
+                    self._stream_to_file(response, dest_path, self._progress, description, total_size)
+                else:
+                    with self._download_progress() as progress:
+                        self._stream_to_file(response, dest_path, progress, description, total_size)
+        except (requests.RequestException, Urllib3HTTPError) as e:
+            console.print(f"[bold red]Download failed:[/bold red] {e}")
+            logger.error(f"Download failed: {e}")
+            sys.exit(1)
+
+    def _probe_ranges(self, url: str) -> Tuple[int, str]:
+        """
+        Returns (size, validator) if the server accepts byte ranges, otherwise (0, "").
+        The validator is a strong ETag or Last-Modified, usable as an If-Range value.
+        """
+        import requests
+
+        try:
+            with get_session().head(url, timeout=30, allow_redirects=True) as response:
+                if response.status_code >= 400:
+                    return 0, ""
+                if response.headers.get("Accept-Ranges", "").lower() != "bytes":
+                    return 0, ""
+                etag = response.headers.get("ETag", "")
+                if etag.startswith("W/"):
+                    # Weak ETags are not allowed in If-Range
+                    etag = ""
+                validator = etag or response.headers.get("Last-Modified", "")
+                return int(response.headers.get("Content-Length", 0)), validator
+        except (requests.RequestException, ValueError):
+            return 0, ""
+
+    @staticmethod
+    def _discard_part(part_path: str):
+        """Removes a partial download and its validator sidecar, if present."""
+        for path in (part_path, part_path + ".meta"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _fetch_range(self, url: str, part_path: str, start: int, end: int, progress: "Progress", task,
+                     if_range: str = "", record: Optional[Callable[[int], None]] = None) -> bool:
+        """
+        Downloads bytes start..end into part_path at the same offset, resuming from the
+        last byte written on network errors. Returns False if the server ignores the range
+        or, with if_range set, if the remote file no longer matches that validator.
+        record, if given, is called with the next offset to fetch once the bytes before it are flushed.
+        """
+        import requests
+        from urllib3.exceptions import HTTPError as Urllib3HTTPError
+
+        offset = start
+        view = memoryview(bytearray(DOWNLOAD_CHUNK_SIZE))
+        with open(part_path, "r+b") as f:
+            try:
+                for attempt in range(1, DOWNLOAD_RETRIES + 1):
+                    try:
+                        headers = {"Range": f"bytes={offset}-{end}"}
+                        if if_range:
+                            headers["If-Range"] = if_range
+                        with get_session().get(url, headers=headers, stream=True, timeout=60) as response:
+                            response.raise_for_status()
+                            if response.status_code != 206:
+                                return False
+                            f.seek(offset)
+                            pending = 0
+                            while offset <= end:
+                                if self._cancel.is_set():
+                                    raise DownloadCancelled(part_path)
+                                n = response.raw.readinto(view[:min(DOWNLOAD_CHUNK_SIZE, end - offset + 1)])
+                                if not n:
+                                    break
+                                f.write(view[:n])
+                                offset += n
+                                pending += n
+                                if pending >= PROGRESS_UPDATE_BYTES:
+                                    progress.update(task, advance=pending)
+                                    pending = 0
+                                    if record:
+                                        f.flush()
+                                        record(offset)
+                            if pending:
+                                progress.update(task, advance=pending)
+                        if offset > end:
+                            return True
+                    except (requests.RequestException, Urllib3HTTPError) as e:
+                        logger.warning(f"Range {offset}-{end} interrupted (attempt {attempt}/{DOWNLOAD_RETRIES}): {e}")
+            finally:
+                if record:
+                    f.flush()
+                    record(offset)
+        raise requests.RequestException(f"Range {start}-{end} incomplete after {DOWNLOAD_RETRIES} attempts")
+
+    def _load_part_state(self, meta_path: str, total_size: int, validator: str) -> Optional[List[List[int]]]:
+        """
+        Returns the [start, end, next_offset] list recorded for a .part file, or None if
+        the sidecar is missing, unreadable or was written for a different remote file.
+        """
+        try:
+            with open(meta_path) as f:
+                state = json.load(f)
+            if state["size"] != total_size or state["validator"] != validator:
+                return None
+            ranges = [[int(lo), int(hi), int(nxt)] for lo, hi, nxt in state["ranges"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if not all(lo <= nxt <= hi + 1 for lo, hi, nxt in ranges):
+            return None
+        return ranges
+
+    def download_file_ranged(self, url: str, dest_path: str, description: str = "Downloading..."):
+        """
+        Downloads url using HTTP Range requests: resumes a leftover .part file, or splits
+        large files into parallel ranges. Falls back to download_file without range support.
+        """
+        import requests
+        from urllib3.exceptions import HTTPError as Urllib3HTTPError
+
+        total_size, validator = self._probe_ranges(url)
+        if not total_size:
+            self.download_file(url, dest_path, description)
+            return
+
+        part_path = dest_path + ".part"
+        meta_path = part_path + ".meta"
+        # A .part is only resumable against the same remote size and validator; the sidecar
+        # records how far each range got, so parallel downloads resume too
+        ranges = None
+        if validator and os.path.exists(part_path) and os.path.getsize(part_path) == total_size:
+            ranges = self._load_part_state(meta_path, total_size, validator)
+
+        if ranges:
+            resumed = sum(nxt - lo for lo, _, nxt in ranges)
+            logger.info(f"Resuming download of {url} ({resumed} of {total_size} bytes already fetched)")
+        else:
+            resumed = 0
+            self._discard_part(part_path)
+            with open(part_path, "wb") as f:
+                # Ranges write at their own offsets into a preallocated file
+                f.truncate(total_size)
+            parts = DOWNLOAD_PARTS if total_size >= PARALLEL_DOWNLOAD_MIN_SIZE else 1
+            step = -(-total_size // parts)
+            ranges = [[lo, min(lo + step, total_size) - 1, lo] for lo in range(0, total_size, step)]
+
+        state_lock = threading.Lock()
+
+        def save_state():
+            with state_lock:
+                tmp_path = meta_path + ".tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump({"size": total_size, "validator": validator, "ranges": ranges}, f)
+                os.replace(tmp_path, meta_path)
+
+        def recorder(idx: int) -> Callable[[int], None]:
+            def record(offset: int):
+                ranges[idx][2] = offset
+                save_state()
+            return record
+
+        if validator:
+            save_state()
+
+        pending_ranges = [(idx, nxt, hi) for idx, (_, hi, nxt) in enumerate(ranges) if nxt <= hi]
+        logger.info(f"Downloading {url} to {dest_path} in {len(pending_ranges)} range(s)")
+        progress_ctx = nullcontext(self._progress) if self._progress is not None else self._download_progress()
+        completed = False
+        try:
+            with progress_ctx as progress:
+                task = progress.add_task(f"[cyan]{description}", total=total_size, completed=resumed)
+                executor = ThreadPoolExecutor(max_workers=max(1, len(pending_ranges)))
+                try:
+                    futures = [executor.submit(self._fetch_range, url, part_path, lo, hi, progress, task, validator,
+                                               recorder(idx) if validator else None)
+                               for idx, lo, hi in pending_ranges]
+                    done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+                    for future in futures:
+                        if future in done and future.exception() is not None:
+                            raise future.exception()
+                    ranged = all(future.result() for future in futures)
+                    completed = True
+                except BaseException:
+                    # Stop the other ranges instead of letting them run to completion
+                    self._cancel.set()
+                    raise
+                finally:
+                    executor.shutdown(wait=True, cancel_futures=True)
+        except (requests.RequestException, Urllib3HTTPError) as e:
             console.print(f"[bold red]Download failed:[/bold red] {e}")
             logger.error(f"Download failed: {e}")
             sys.exit(1)
+        finally:
+            # Without a validator the preallocated .part can never be resumed, so don't leave it behind
+            if not completed and not validator:
+                self._discard_part(part_path)
+
+        if not ranged:
+            logger.info("Server ignored the Range header or the file changed. Falling back to a single stream.")
+            self._discard_part(part_path)
+            self.download_file(url, dest_path, description)
+            return
+
+        os.replace(part_path, dest_path)
+        self._discard_part(part_path)
 
     def download_or_copy_source(self) -> str:
         """Downloads file from URL using Requests with Rich progress bar."""
@@ -174,7 +603,7 @@ class OdooUpgrader:
         if self.source.startswith("http://") or self.source.startswith("https://"):
             filename = os.path.basename(self.source.split("?")[0]) or "downloaded_db.dump"
             target_path = os.path.join(self.cwd, filename)
-            self.download_file(self.source, target_path, "Downloading source DB...")
+            self.download_file_ranged(self.source, target_path, "Downloading source DB...")
         else:
             target_path = self.source
         return target_path
@@ -191,8 +620,7 @@ class OdooUpgrader:
             zip_path = os.path.join(self.source_dir, "addons.zip")
             self.download_file(self.extra_addons, zip_path, "Downloading extra addons...")
             try:
-                with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                    zip_ref.extractall(self.custom_addons_dir)
+                self._parallel_extract(zip_path, self.custom_addons_dir)
                 os.remove(zip_path)
             except zipfile.BadZipFile:
                 console.print("[bold red]Error:[/bold red] Downloaded addons file is not a valid zip.")
@@ -201,8 +629,7 @@ class OdooUpgrader:
 
         elif os.path.isfile(self.extra_addons) and self.extra_addons.lower().endswith('.zip'):
             try:
-                with zipfile.ZipFile(self.extra_addons, 'r') as zip_ref:
-                    zip_ref.extractall(self.custom_addons_dir)
+                self._parallel_extract(self.extra_addons, self.custom_addons_dir)
             except zipfile.BadZipFile:
                 console.print("[bold red]Error:[/bold red] Addons file is not a valid zip.")
                 sys.exit(1)
@@ -224,15 +651,22 @@ class OdooUpgrader:
 
                 if not is_module:
                     logger.info(f"Detected wrapper directory '{items[0]}'. Flattening structure...")
-                    for sub in sub_items:
-                        src_sub = os.path.join(single_item_path, sub)
-                        dst_sub = os.path.join(self.custom_addons_dir, sub)
-                        if not os.path.exists(dst_sub):
-                            shutil.move(src_sub, dst_sub)
-                    try:
-                        os.rmdir(single_item_path)
-                    except OSError:
-                        pass
+                    if os.listdir(self.custom_addons_dir) == [items[0]]:
+                        # Nothing else at the root: swap the wrapper in with a few renames
+                        tmp_path = self.custom_addons_dir + ".tmp"
+                        os.replace(single_item_path, tmp_path)
+                        os.rmdir(self.custom_addons_dir)
+                        os.replace(tmp_path, self.custom_addons_dir)
+                    else:
+                        for sub in sub_items:
+                            src_sub = os.path.join(single_item_path, sub)
+                            dst_sub = os.path.join(self.custom_addons_dir, sub)
+                            if not os.path.exists(dst_sub):
+                                self._fast_move(src_sub, dst_sub)
+                        try:
+                            os.rmdir(single_item_path)
+                        except OSError:
+                            pass
 
         # Check for flat structure (single module at root)
         items = os.listdir(self.custom_addons_dir)
@@ -242,13 +676,19 @@ class OdooUpgrader:
             logger.info("Detected flat addon structure. Reorganizing...")
             sub_folder_name = "downloaded_module"
             sub_folder_path = os.path.join(self.custom_addons_dir, sub_folder_name)
-            os.makedirs(sub_folder_path, exist_ok=True)
 
-            for item in items:
-                src = os.path.join(self.custom_addons_dir, item)
-                dst = os.path.join(sub_folder_path, item)
-                if src != sub_folder_path:
-                    shutil.move(src, dst)
+            if sub_folder_name not in items:
+                # Move the whole directory down one level instead of each entry
+                tmp_path = self.custom_addons_dir + ".tmp"
+                os.replace(self.custom_addons_dir, tmp_path)
+                os.makedirs(self.custom_addons_dir)
+                os.replace(tmp_path, sub_folder_path)
+            else:
+                for item in items:
+                    src = os.path.join(self.custom_addons_dir, item)
+                    dst = os.path.join(sub_folder_path, item)
+                    if src != sub_folder_path:
+                        self._fast_move(src, dst)
 
         # Ensure requirements.txt exists
         req_path = os.path.join(self.custom_addons_dir, "requirements.txt")
@@ -260,35 +700,30 @@ class OdooUpgrader:
 
         # Standardize permissions for Docker compatibility
         logger.info("Standardizing addon permissions...")
-        for root, dirs, files in os.walk(self.custom_addons_dir):
-            for d in dirs:
-                try:
-                    os.chmod(os.path.join(root, d), 0o755)
-                except Exception:
-                    pass
-            for f in files:
-                try:
-                    if f.endswith('.sh'):
-                        os.chmod(os.path.join(root, f), 0o755)
-                    else:
-                        os.chmod(os.path.join(root, f), 0o644)
-                except Exception:
-                    pass
+        self._parallel_chmod(self.custom_addons_dir, 0o644, 0o755, script_mode=0o755)
 
         console.print("[green]Custom addons prepared.[/green]")
 
+    def _fast_move(self, src: str, dst: str):
+        """Moves with a plain rename, falling back to shutil.move across filesystems."""
+        try:
+            os.replace(src, dst)
+        except OSError:
+            shutil.move(src, dst)
+
     def _get_custom_module_names(self) -> str:
         """Scans the custom_addons_dir for valid Odoo modules and returns a comma-separated string."""
         if not self.extra_addons or not os.path.exists(self.custom_addons_dir):
             return ""
 
+        manifests = {'__manifest__.py', '__openerp__.py'}
         modules = []
-        for item in os.listdir(self.custom_addons_dir):
-            item_path = os.path.join(self.custom_addons_dir, item)
-            if os.path.isdir(item_path):
-                if (os.path.exists(os.path.join(item_path, '__manifest__.py')) or
-                        os.path.exists(os.path.join(item_path, '__openerp__.py'))):
-                    modules.append(item)
+        with os.scandir(self.custom_addons_dir) as it:
+            for entry in it:
+                if entry.is_dir():
+                    with os.scandir(entry.path) as sub:
+                        if any(e.name in manifests for e in sub):
+                            modules.append(entry.name)
 
         if modules:
             return "," + ",".join(modules)
@@ -301,8 +736,7 @@ class OdooUpgrader:
         if ext == '.zip':
             console.print("[blue]Extracting ZIP file...[/blue]")
             logger.info("Extracting ZIP file...")
-            with zipfile.ZipFile(filepath, 'r') as zip_ref:
-                zip_ref.extractall(self.source_dir)
+            self._parallel_extract(filepath, self.source_dir)
             return "ZIP"
         else:
             console.print("[blue]Processing DUMP file...[/blue]")
@@ -312,6 +746,10 @@ class OdooUpgrader:
 
     def create_db_compose_file(self):
         """Generates the docker-compose file for the database."""
+        volume_name = ""
+        if self.keep_db_volume:
+            # A fixed name lets later runs find the volume; data directories are per major version
+            volume_name = f"\n    name: {DB_VOLUME_PREFIX}-{self.postgres_version}"
         content = f"""
 services:
   db-odooupgrade:
@@ -333,7 +771,7 @@ networks:
     name: odooupgrade-connection
 
 volumes:
-  postgres_data:
+  postgres_data:{volume_name}
 """
         with open("db-composer.yml", "w", newline='\n') as f:
             f.write(content.strip())
@@ -355,12 +793,78 @@ volumes:
         console.print("[bold red]Database failed to start.[/bold red]")
         sys.exit(1)
 
+    def compute_source_fingerprint(self, filepath: str) -> str:
+        """Hashes the source file together with the Postgres version used to restore it."""
+        digest = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        digest.update(self.postgres_version.encode())
+        return digest.hexdigest()
+
+    def _can_reuse_database(self) -> bool:
+        """Checks whether the kept volume already holds a template restored from the same source."""
+        if not (self.keep_db_volume and self._source_fingerprint):
+            return False
+        # The fingerprint lives on the template database itself, so it always describes this volume
+        query = f"SELECT shobj_description(oid, 'pg_database') FROM pg_database WHERE datname = '{TEMPLATE_DB}';"
+        res = self._run_cmd(["docker", "exec", "db-odooupgrade", "psql", "-U", "odoo", "-d", "odoo", "-t", "-A",
+                             "-c", query], check=False, capture_output=True)
+        return res.returncode == 0 and res.stdout.strip() == self._source_fingerprint
+
+    def _restore_filestore(self):
+        """Copies the filestore extracted from a ZIP source into the output directory."""
+        src_filestore = os.path.join(self.source_dir, "filestore")
+        if os.path.exists(src_filestore):
+            try:
+                shutil.copytree(src_filestore, self.filestore_dir, dirs_exist_ok=True)
+                if self._posix:
+                    try:
+                        os.chmod(self.filestore_dir, 0o777)
+                        self._parallel_chmod(self.filestore_dir, 0o777, 0o777)
+                    except Exception as e:
+                        logger.warning(f"Failed to set filestore permissions: {e}")
+            except Exception as e:
+                logger.warning(f"Failed to copy filestore: {e}")
+
     def restore_database(self, file_type: str):
         """Restores the database dump."""
+        if file_type == "ZIP":
+            self._restore_filestore()
+
+        # The upgrade always works on a fresh "database"; with a kept volume the restore goes
+        # into a pristine template that later runs copy from
+        restore_db = TEMPLATE_DB if self.keep_db_volume else "database"
+        if self.keep_db_volume:
+            self._run_cmd(["docker", "exec", "db-odooupgrade", "dropdb", "-U", "odoo", "--if-exists", "database"],
+                          check=False)
+
+        if self._can_reuse_database():
+            console.print("[green]Source unchanged since last run. Reusing restored database.[/green]")
+            logger.info("Skipping restore: fingerprint matches kept database volume.")
+        else:
+            restored = self._restore_dump(file_type, restore_db)
+            # A partial restore must not be reused by later runs, so only a clean one is stamped
+            if restored and self.keep_db_volume and self._source_fingerprint:
+                self._run_cmd(["docker", "exec", "db-odooupgrade", "psql", "-U", "odoo", "-d", "odoo", "-c",
+                               f"COMMENT ON DATABASE {TEMPLATE_DB} IS '{self._source_fingerprint}';"],
+                              capture_output=True)
+
+        if self.keep_db_volume:
+            self._run_cmd(["docker", "exec", "db-odooupgrade", "createdb", "-U", "odoo", "-T", TEMPLATE_DB,
+                           "database"])
+
+    def _restore_dump(self, file_type: str, db_name: str) -> bool:
+        """
+        Restores the extracted dump into db_name, replacing any existing database of that name.
+        Returns False if the restore tool reported a failure.
+        """
         console.print("[blue]Restoring database...[/blue]")
         logger.info("Restoring database...")
 
-        self._run_cmd(["docker", "exec", "db-odooupgrade", "createdb", "-U", "odoo", "database"], check=False)
+        self._run_cmd(["docker", "exec", "db-odooupgrade", "dropdb", "-U", "odoo", "--if-exists", db_name],
+                      check=False)
+        self._run_cmd(["docker", "exec", "db-odooupgrade", "createdb", "-U", "odoo", db_name], check=False)
 
         if file_type == "ZIP":
             dump_path = os.path.join(self.source_dir, "dump.sql")
@@ -372,39 +876,51 @@ volumes:
                     console.print("[bold red]No dump.sql found inside ZIP.[/bold red]")
                     sys.exit(1)
 
-            src_filestore = os.path.join(self.source_dir, "filestore")
-            if os.path.exists(src_filestore):
-                try:
-                    shutil.copytree(src_filestore, self.filestore_dir, dirs_exist_ok=True)
-                    if sys.platform != "win32":
-                        try:
-                            os.chmod(self.filestore_dir, 0o777)
-                            for root, dirs, files in os.walk(self.filestore_dir):
-                                for d in dirs:
-                                    os.chmod(os.path.join(root, d), 0o777)
-                                for f in files:
-                                    os.chmod(os.path.join(root, f), 0o777)
-                        except Exception as e:
-                            logger.warning(f"Failed to set filestore permissions: {e}")
-                except Exception as e:
-                    logger.warning(f"Failed to copy filestore: {e}")
-
-            self._run_cmd(["docker", "cp", dump_path, "db-odooupgrade:/tmp/dump.sql"])
-            self._run_cmd(["docker", "exec", "-i", "db-odooupgrade", "psql", "-U", "odoo", "-d", "database", "-f",
-                           "/tmp/dump.sql"], capture_output=True)
+            # Feed the SQL through psql's stdin rather than copying it into the container first.
+            # Asynchronous commit avoids an fsync per statement without wrapping the dump in one
+            # transaction, so statements the server rejects (e.g. settings from a newer pg_dump)
+            # are skipped as before. ODOOUPGRADER_STRICT_RESTORE=1 makes any error fatal instead.
+            strict = os.environ.get("ODOOUPGRADER_STRICT_RESTORE", "0") == "1"
+            cmd = ["docker", "exec", "-i", "-e", "PGOPTIONS=-c synchronous_commit=off", "db-odooupgrade",
+                   "psql", "-U", "odoo", "-d", db_name]
+            if strict:
+                cmd += ["-v", "ON_ERROR_STOP=1", "--single-transaction"]
+            try:
+                with open(dump_path, "rb") as f:
+                    res = self._run_cmd(cmd, capture_output=True, stdin=f)
+            except subprocess.CalledProcessError as e:
+                error = (e.stderr or "").strip().splitlines()
+                console.print("[bold red]SQL restore failed:[/bold red] "
+                              f"{error[-1] if error else f'psql exited with code {e.returncode}'}")
+                if strict:
+                    console.print("Unset ODOOUPGRADER_STRICT_RESTORE to skip failing statements.")
+                sys.exit(1)
+            if res.stderr:
+                errors = [line for line in res.stderr.splitlines() if "ERROR" in line]
+                if errors:
+                    logger.warning(f"psql skipped {len(errors)} failing statement(s) during restore; "
+                                   f"first: {errors[0]}")
+            return res.returncode == 0
 
         elif file_type == "DUMP":
             dump_path = os.path.join(self.source_dir, "database.dump")
             self._run_cmd(["docker", "cp", dump_path, "db-odooupgrade:/tmp/database.dump"])
 
+            # pg_restore -j needs a seekable file, so this dump is copied in rather than piped.
+            # Parallel jobs cannot be combined with --single-transaction.
+            jobs = min(8, os.cpu_count() or 1)
             cmd = [
                 "docker", "exec", "db-odooupgrade", "pg_restore",
-                "-U", "odoo", "-d", "database",
+                "-U", "odoo", "-d", db_name,
                 "--no-owner", "--no-privileges", "--clean", "--if-exists",
-                "--disable-triggers", "--single-transaction",
+                "--disable-triggers", "-j", str(jobs),
                 "/tmp/database.dump"
             ]
-            self._run_cmd(cmd, check=False)
+            res = self._run_cmd(cmd, check=False)
+            if res.returncode != 0:
+                logger.warning(f"pg_restore exited with code {res.returncode}; the restore may be incomplete")
+                return False
+        return True
 
     def get_current_version(self) -> str:
         """Queries the database to find the current Odoo version."""
@@ -414,34 +930,51 @@ volumes:
             "SELECT latest_version FROM ir_module_module WHERE name = 'base' ORDER BY id DESC LIMIT 1;"
         ]
 
-        for q in queries:
+        # Once a query has worked for this database, skip the others
+        if self._version_query_idx is not None:
+            candidates = [self._version_query_idx]
+        else:
+            candidates = range(len(queries))
+
+        for idx in candidates:
             cmd = ["docker", "exec", "-i", "db-odooupgrade", "psql", "-U", "odoo", "-d", "database", "-t", "-A", "-c",
-                   q]
+                   queries[idx]]
             try:
                 res = self._run_cmd(cmd, check=False, capture_output=True)
                 ver = res.stdout.strip()
                 if ver:
+                    self._version_query_idx = idx
                     return ver
             except Exception:
                 continue
+
+        if self._version_query_idx is not None:
+            # The cached query stopped answering; retry the full list once
+            self._version_query_idx = None
+            return self.get_current_version()
         return ""
 
-    def get_version_info(self, ver_str: str) -> version.Version:
+    def get_version_info(self, ver_str: str) -> "version.Version":
         """Parses version string securely using packaging.version."""
-        try:
-            clean_ver = ver_str.strip()
-            return version.parse(clean_ver)
-        except Exception:
-            return version.parse("0.0")
+        return _parse_version(ver_str)
 
     def generate_next_version(self, current: str) -> str:
         """Calculates next major version (e.g. 15.0 -> 16.0)."""
-        try:
-            major = int(current.split('.')[0])
-            return f"{major + 1}.0"
-        except Exception:
-            v = version.parse(current)
-            return f"{v.major + 1}.0"
+        major = current.strip().split('.')[0]
+        if major.isdigit():
+            return f"{int(major) + 1}.0"
+        return f"{self.get_version_info(current).major + 1}.0"
+
+    def _drain_stream(self, stream, tail: Optional[collections.deque] = None):
+        """Logs each line of a subprocess pipe, optionally keeping the most recent lines in tail."""
+        for output in iter(stream.readline, ''):
+            line = output.rstrip()
+            if self.verbose:
+                console.print(f"[dim]{line}[/dim]")
+            logger.debug(line)
+            if tail is not None:
+                tail.append(line)
+        stream.close()
 
     def run_upgrade_step(self, target_version: str) -> bool:
         """Builds and runs the OpenUpgrade container."""
@@ -454,15 +987,12 @@ volumes:
         custom_modules_load = ""
 
         if self.extra_addons:
-            # Force cache invalidation so COPY instructions run every time
-            with open(os.path.join(self.custom_addons_dir, ".build_timestamp"), "w") as f:
-                f.write(str(time.time()))
-
-            # Optimized Layering: Copy reqs first, then pip, then code
+            # Optimized Layering: Copy reqs first, then pip, then code. COPY layers are keyed on
+            # file contents, so only changed addons invalidate the last layer.
             extra_addons_cmds = """
 RUN mkdir -p /mnt/custom-addons
 COPY --chown=odoo:odoo ./output/custom_addons/requirements.txt /mnt/custom-addons/requirements.txt
-RUN pip3 install --no-cache-dir -r /mnt/custom-addons/requirements.txt
+RUN --mount=type=cache,target=/root/.cache/pip pip3 install -r /mnt/custom-addons/requirements.txt
 COPY --chown=odoo:odoo ./output/custom_addons/ /mnt/custom-addons/
 """
 
@@ -473,12 +1003,17 @@ COPY --chown=odoo:odoo ./output/custom_addons/ /mnt/custom-addons/
             else:
                 logger.info("Intermediate version. Skipping custom addons loading.")
 
+        # BuildKit cache mounts keep apt and pip downloads between steps and runs
         dockerfile_content = f"""
+# syntax=docker/dockerfile:1.4
 FROM odoo:{target_version}
 USER root
-RUN apt-get update && apt-get install -y git && rm -rf /var/lib/apt/lists/*
+RUN rm -f /etc/apt/apt.conf.d/docker-clean
+RUN --mount=type=cache,target=/var/cache/apt,sharing=locked \\
+    --mount=type=cache,target=/var/lib/apt,sharing=locked \\
+    apt-get update && apt-get install -y git
 RUN git clone https://github.com/OCA/OpenUpgrade.git --depth 1 --branch {target_version} /mnt/extra-addons
-RUN pip3 install --no-cache-dir -r /mnt/extra-addons/requirements.txt
+RUN --mount=type=cache,target=/root/.cache/pip pip3 install -r /mnt/extra-addons/requirements.txt
 
 {extra_addons_cmds}
 
@@ -525,7 +1060,10 @@ networks:
 
         self._run_cmd(["docker", "rm", "-f", "odoo-openupgrade"], check=False, capture_output=True)
 
-        cmd_up = self.compose_cmd + ["-f", "odoo-upgrade-composer.yml", "up", "--build", "--abort-on-container-exit"]
+        cmd_up = self.compose_cmd + ["-f", "odoo-upgrade-composer.yml", "up", "--build", "--abort-on-container-exit",
+                                     "--exit-code-from", "odoo-openupgrade"]
+
+        from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
 
         with Progress(
                 SpinnerColumn(),
@@ -542,25 +1080,30 @@ networks:
                     stderr=subprocess.PIPE,
                     text=True,
                     bufsize=1,
-                    universal_newlines=True
+                    universal_newlines=True,
+                    env={**os.environ, "DOCKER_BUILDKIT": "1", "COMPOSE_DOCKER_CLI_BUILD": "1"}
                 )
 
-                while True:
-                    output = process.stdout.readline()
-                    if output == '' and process.poll() is not None:
-                        break
-                    if output:
-                        line = output.strip()
-                        if self.verbose:
-                            console.print(f"[dim]{line}[/dim]")
-                        logger.debug(line)
-
-                stderr_output = process.stderr.read() if process.stderr else ""
+                # Drain both pipes concurrently so a full stderr buffer cannot stall the container
+                stderr_tail = collections.deque(maxlen=STDERR_TAIL_LINES)
+                drainers = [
+                    threading.Thread(target=self._drain_stream, args=(process.stdout,), daemon=True),
+                    threading.Thread(target=self._drain_stream, args=(process.stderr, stderr_tail), daemon=True),
+                ]
+                for t in drainers:
+                    t.start()
+                process.wait()
+                for t in drainers:
+                    t.join()
+
+                stderr_output = "\n".join(stderr_tail)
                 if stderr_output:
                     logger.error(f"Container Error Stream: {stderr_output}")
 
+                # --exit-code-from makes compose return the container's own exit code
+                logger.info(f"Container exit code: {process.returncode}")
                 if process.returncode != 0:
-                    console.print("[bold red]Upgrade process failed.[/bold red]")
+                    console.print(f"[bold red]Container exited with code {process.returncode}[/bold red]")
                     logger.error("Upgrade process returned non-zero exit code.")
                     if not self.verbose and stderr_output:
                         console.print(stderr_output)
@@ -571,22 +1114,20 @@ networks:
                 logger.error(f"Exception during upgrade subprocess: {e}")
                 return False
 
+        console.print(f"[green]Upgrade to {target_version} successful.[/green]")
+        self._run_cmd(self.compose_cmd + ["-f", "odoo-upgrade-composer.yml", "down"], check=False)
+        return True
+
+    def _is_precompressed(self, path: str) -> bool:
+        """Checks whether a file is already compressed, by extension or by header bytes."""
+        if os.path.splitext(path)[1].lower() in PRECOMPRESSED_EXTENSIONS:
+            return True
         try:
-            res = self._run_cmd(["docker", "inspect", "odoo-openupgrade", "--format={{.State.ExitCode}}"],
-                                capture_output=True)
-            exit_code = int(res.stdout.strip())
-            logger.info(f"Container exit code: {exit_code}")
-
-            if exit_code == 0:
-                console.print(f"[green]Upgrade to {target_version} successful.[/green]")
-                self._run_cmd(self.compose_cmd + ["-f", "odoo-upgrade-composer.yml", "down"], check=False)
-                return True
-            else:
-                console.print(f"[bold red]Container exited with code {exit_code}[/bold red]")
-                return False
-        except Exception as e:
-            logger.error(f"Error checking exit code: {e}")
+            with open(path, "rb") as f:
+                header = f.read(12)
+        except OSError:
             return False
+        return header.startswith(PRECOMPRESSED_SIGNATURES) or (header[:4] == b"RIFF" and header[8:12] == b"WEBP")
 
     def finalize_package(self):
         """Dumps final database and zips it."""
@@ -594,27 +1135,37 @@ networks:
         logger.info("Creating final package...")
 
         dump_cmd = ["docker", "exec", "db-odooupgrade", "pg_dump", "-U", "odoo", "database"]
-        try:
-            with open(os.path.join(self.output_dir, "dump.sql"), "w") as f:
-                subprocess.run(dump_cmd, stdout=f, check=True)
-        except Exception as e:
-            logger.error(f"Failed to dump database: {e}")
-            raise
-
         zip_name = os.path.join(self.output_dir, "upgraded.zip")
         with zipfile.ZipFile(zip_name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            zipf.write(os.path.join(self.output_dir, "dump.sql"), "dump.sql")
+            # Stream pg_dump straight into the archive instead of spooling dump.sql to disk
+            dump_info = zipfile.ZipInfo("dump.sql", date_time=time.localtime()[:6])
+            dump_info.compress_type = zipfile.ZIP_DEFLATED
+            process = subprocess.Popen(dump_cmd, stdout=subprocess.PIPE)
+            try:
+                with zipf.open(dump_info, "w", force_zip64=True) as sink:
+                    shutil.copyfileobj(process.stdout, sink, DOWNLOAD_CHUNK_SIZE)
+                process.stdout.close()
+                if process.wait() != 0:
+                    raise subprocess.CalledProcessError(process.returncode, dump_cmd)
+            except Exception as e:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+                logger.error(f"Failed to dump database: {e}")
+                zipf.close()
+                os.remove(zip_name)
+                raise
 
             if os.path.exists(self.filestore_dir):
-                for root, _, files in os.walk(self.filestore_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, self.output_dir)
+                for file_path, _ in self._iter_files(self.filestore_dir):
+                    arcname = os.path.relpath(file_path, self.output_dir)
+                    if self._is_precompressed(file_path):
+                        zipf.write(file_path, arcname, compress_type=zipfile.ZIP_STORED)
+                    else:
                         zipf.write(file_path, arcname)
 
         console.print(f"[bold green]Upgrade Complete! Package available at: {zip_name}[/bold green]")
         logger.info(f"Upgrade Complete. Package: {zip_name}")
-        os.remove(os.path.join(self.output_dir, "dump.sql"))
 
     def cleanup_artifacts(self):
         """Removes source folder and extracted filestore."""
@@ -628,29 +1179,63 @@ networks:
         console.print("[dim]Cleaning up Docker environment...[/dim]")
         logger.info("Cleaning up Docker environment...")
         if os.path.exists("db-composer.yml"):
-            self._run_cmd(self.compose_cmd + ["-f", "db-composer.yml", "down", "-v"], check=False)
+            down_cmd = self.compose_cmd + ["-f", "db-composer.yml", "down"]
+            if not self.keep_db_volume:
+                down_cmd.append("-v")
+            self._run_cmd(down_cmd, check=False)
 
         for f in ["Dockerfile", "odoo-upgrade-composer.yml", "db-composer.yml"]:
             if os.path.exists(f):
                 os.remove(f)
 
+    def start_database(self):
+        """Writes the database compose file and starts the Postgres container."""
+        self.create_db_compose_file()
+        self._run_cmd(self.compose_cmd + ["-f", "db-composer.yml", "up", "-d"], capture_output=True)
+
+    def prepare_sources_and_database(self) -> str:
+        """Fetches the source DB, prepares custom addons and starts Postgres concurrently."""
+        self._cancel.clear()
+        with self._download_progress() as progress:
+            self._progress = progress
+            executor = ThreadPoolExecutor(max_workers=3)
+            try:
+                futures = [
+                    executor.submit(self.start_database),
+                    executor.submit(self.download_or_copy_source),
+                    executor.submit(self.process_extra_addons),
+                ]
+                done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+                for future in futures:
+                    if future in done and future.exception() is not None:
+                        raise future.exception()
+                return futures[1].result()
+            except BaseException:
+                # Fail fast: downloads stop at their next chunk instead of running to completion
+                self._cancel.set()
+                raise
+            finally:
+                # Still join every branch so cleanup() never races a compose up still in flight
+                executor.shutdown(wait=True, cancel_futures=True)
+                self._progress = None
+
     def run(self):
         try:
             logger.info("Starting OdooUpgrader...")
             if self.target_version not in self.VALID_VERSIONS:
-                console.print(f"[bold red]Invalid version. Supported: {self.VALID_VERSIONS}[/bold red]")
+                console.print(f"[bold red]Invalid version. Supported: {', '.join(self.VALID_VERSIONS)}[/bold red]")
                 sys.exit(1)
 
             self.validate_source_accessibility()
+            # Resolve the compose command up front so a missing Docker stops the run before any download
+            logger.debug(f"Using compose command: {' '.join(self.compose_cmd)}")
             self.prepare_environment()
-            self.process_extra_addons()
 
-            self.create_db_compose_file()
-
-            self._run_cmd(self.compose_cmd + ["-f", "db-composer.yml", "up", "-d"])
+            local_source = self.prepare_sources_and_database()
             self.wait_for_db()
 
-            local_source = self.download_or_copy_source()
+            if self.keep_db_volume:
+                self._source_fingerprint = self.compute_source_fingerprint(local_source)
             file_type = self.process_source_file(local_source)
 
             if local_source != self.source and os.path.exists(local_source):
@@ -675,6 +1260,7 @@ networks:
                 console.print("[bold red]Source database version is below 10.0. Not supported.[/bold red]")
                 sys.exit(1)
 
+            steps_done = 0
             while True:
                 current_ver = self.get_version_info(current_ver_str)
 
@@ -694,8 +1280,20 @@ networks:
                     if not self.run_upgrade_step(next_ver_str):
                         console.print("[bold red]Aborting sequence.[/bold red]")
                         sys.exit(1)
-
-                    current_ver_str = self.get_current_version()
+                    steps_done += 1
+
+                    # A successful step lands on next_ver_str; confirm with the database periodically
+                    # and always before the final package is built
+                    if self.get_version_info(next_ver_str).major >= target_ver.major:
+                        current_ver_str = self.get_current_version()
+                        if not current_ver_str:
+                            console.print("[bold red]Could not determine database version.[/bold red]")
+                            logger.error("Could not determine database version after the final upgrade step")
+                            sys.exit(1)
+                    elif steps_done % VERSION_CHECK_INTERVAL == 0:
+                        current_ver_str = self.get_current_version() or next_ver_str
+                    else:
+                        current_ver_str = next_ver_str
                     console.print(f"[blue]Database is now at version: {current_ver_str}[/blue]")
 
         except KeyboardInterrupt:
@@ -0,0 +1,6 @@
+"""
+Supported Odoo versions, kept free of heavy imports so the CLI can load it cheaply.
+"""
+from typing import Tuple
+
+VALID_VERSIONS: Tuple[str, ...] = ("10.0", "11.0", "12.0", "13.0", "14.0", "15.0", "16.0", "17.0", "18.0")